@@ -1,7 +1,75 @@
 import re
-import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 import sys
+import functools
+from types import MappingProxyType
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
 import argparse # Added for CLI argument parsing
+from typing import Iterator, Mapping, Optional
+
+# Regular expression engine used for parsing. The standard library re module is
+# the default; setting MERMAID_TO_DRAWIO_REGEX=1 opts in to the third-party
+# regex module instead, falling back to re when it is not installed.
+_re = re
+if os.environ.get("MERMAID_TO_DRAWIO_REGEX") == "1":
+    try:
+        import regex as _re
+    except ImportError:
+        print("Warning: MERMAID_TO_DRAWIO_REGEX=1 is set but the regex module is not installed; using re.", file=sys.stderr)
+
+# Regular expression pattern for matching nodes
+_NODE_RE = _re.compile(r"^\s*([\w]+)(?:\[(.*?)\]|\{(.*?)\}|\((.*?)\))?\s*(?:;)?\s*$")
+
+# Regular expression pattern for matching every supported type of edge.
+# The alternatives are tried in order: labeled arrow, labeled line, arrow, line.
+_EDGE_RE = _re.compile(
+    r"^\s*(?P<source>[\w]+)\s*"
+    r"(?:--\s*(?P<arrow_label>.*?)\s*--+>"
+    r"|--\s*(?P<line_label>.*?)\s*--"
+    r"|--+>"
+    r"|---+--)"
+    r"\s*(?P<target>[\w]+)\s*$"
+)
+
+# Draw.io styles for each supported node shape
+_SHAPE_STYLE = {
+    'rectangle': "rounded=0;whiteSpace=wrap;html=1;",
+    'rhombus': "shape=rhombus;whiteSpace=wrap;html=1;",
+    'stadium': "shape=ellipse;perimeter=ellipsePerimeter;whiteSpace=wrap;html=1;",
+    'default': "rounded=0;whiteSpace=wrap;html=1;",
+}
+
+# Draw.io style shared by every edge
+_EDGE_STYLE = "endArrow=classic;html=1;rounded=0;"
+
+# Opening and closing XML shared by every generated Draw.io file, including the
+# two default mxCell elements that all other cells are parented to
+_DRAWIO_XML_HEADER = (
+    '<mxfile compressed="false" host="app.diagrams.net">'
+    '<diagram id="Diagram1" name="Page-1">'
+    '<mxGraphModel dx="1000" dy="800" grid="1" gridSize="10" guides="1" tooltips="1" connect="1" arrows="1" fold="1" page="1" pageScale="1" pageWidth="850" pageHeight="1100" math="0" shadow="0">'
+    '<root>'
+    '<mxCell id="0" />'
+    '<mxCell id="1" parent="0" />'
+)
+_DRAWIO_XML_FOOTER = '</root></mxGraphModel></diagram></mxfile>'
+
+# Entities escaped in attribute values in addition to &, < and >
+_ATTRIB_ENTITIES = {'"': "&quot;", '\r': "&#13;", '\n': "&#10;", '\t': "&#09;"}
+
+def _escape_attrib(text: str) -> str:
+    """
+    Escapes a string for use as an XML attribute value.
+
+    Args:
+        text: The raw attribute value.
+
+    Returns:
+        The escaped attribute value.
+    """
+    return escape(text, _ATTRIB_ENTITIES)
 
 def parse_mermaid_flowchart(mermaid_code: str) -> tuple[list[dict], list[dict]]:
     """
@@ -18,76 +86,50 @@ def parse_mermaid_flowchart(mermaid_code: str) -> tuple[list[dict], list[dict]]:
     # Initialize lists for nodes and edges
     nodes = []
     edges = []
+    # Dictionary for looking up node entries by their ID
+    nodes_by_id = {}
     
-    # Regular expression pattern for matching nodes
-    node_pattern = re.compile(r"^\s*([\w]+)(?:\[(.*?)\]|\{(.*?)\}|\((.*?)\))?\s*(?:;)?\s*$")
-    
-    # Regular expression patterns for matching different types of edges
-    edge_pattern = re.compile(r"^\s*([\w]+)\s*---+--\s*([\w]+)\s*$") 
-    edge_with_arrow_pattern = re.compile(r"^\s*([\w]+)\s*--+>\s*([\w]+)\s*$")
-    edge_with_label_pattern = re.compile(r"^\s*([\w]+)\s*--\s*(.*?)\s*--\s*([\w]+)\s*$")
-    edge_with_label_and_arrow_pattern = re.compile(r"^\s*([\w]+)\s*--\s*(.*?)\s*--+>\s*([\w]+)\s*$")
-
-    # Sets for storing node IDs and processed node definitions to avoid duplicates
-    node_ids = set()
-    processed_node_definitions = set()
+    # Node IDs referenced by edges, kept in a dictionary (with None values) so
+    # that they stay in the order they first appear in
+    node_ids = {}
 
-    # Split the input Mermaid code into lines
-    lines = mermaid_code.strip().split('\n')
+    # Bind frequently used methods to locals to avoid attribute lookups per line
+    nodes_append = nodes.append
+    edges_append = edges.append
+    match_edge = _EDGE_RE.match
+    match_node = _NODE_RE.match
 
     # Process each line to extract nodes and edges
-    for line in lines:
+    for line in mermaid_code.splitlines():
         line = line.strip()
 
+        # Skip blank lines
+        if not line:
+            continue
+
         # Skip lines that define the graph or flowchart orientation
-        if line.lower().startswith("graph") or line.lower().startswith("flowchart"):
+        if line.lower().startswith(("graph", "flowchart")):
             continue
 
-        # Check and process edges with labels and/or arrows
-        matched_edge = False
-        match = edge_with_label_and_arrow_pattern.match(line)
-        if match:
-            source, label, target = match.groups()
-            edges.append({'source': source, 'target': target, 'label': label.strip()})
-            node_ids.add(source)
-            node_ids.add(target)
-            matched_edge = True
-        else:
-            match = edge_with_label_pattern.match(line)
+        # Check and process edges with labels and/or arrows; every edge form
+        # contains "--", so lines without it can go straight to node matching
+        if '--' in line:
+            match = match_edge(line)
             if match:
-                source, label, target = match.groups()
-                edges.append({'source': source, 'target': target, 'label': label.strip()})
-                node_ids.add(source)
-                node_ids.add(target)
-                matched_edge = True
-            else:
-                match = edge_with_arrow_pattern.match(line)
-                if match:
-                    source, target = match.groups()
-                    edges.append({'source': source, 'target': target, 'label': ''})
-                    node_ids.add(source)
-                    node_ids.add(target)
-                    matched_edge = True
-                else:
-                    match = edge_pattern.match(line)
-                    if match:
-                        source, target = match.groups()
-                        edges.append({'source': source, 'target': target, 'label': ''})
-                        node_ids.add(source)
-                        node_ids.add(target)
-                        matched_edge = True
-
-        # Continue to the next line if an edge has been processed
-        if matched_edge:
-            continue
+                source, target = match['source'], match['target']
+                label = match['arrow_label'] or match['line_label'] or ''
+                edges_append({'source': source, 'target': target, 'label': label.strip()})
+                node_ids[source] = None
+                node_ids[target] = None
+                continue
 
         # Process nodes with different shapes
-        match = node_pattern.match(line)
+        match = match_node(line)
         if match:
             node_id, rect_label, rhomb_label, stadium_label = match.groups()
             
-            # Skip processing if the node has already been defined
-            if node_id in processed_node_definitions:
+            # Skip processing if the node has already been defined (first definition wins)
+            if node_id in nodes_by_id:
                 continue
 
             label = node_id 
@@ -104,51 +146,33 @@ def parse_mermaid_flowchart(mermaid_code: str) -> tuple[list[dict], list[dict]]:
                 label = stadium_label.strip()
                 shape = 'stadium'
             
-            # Update or add the node information
-            existing_node = next((n for n in nodes if n['id'] == node_id), None)
-            if existing_node:
-                existing_node['label'] = label
-                existing_node['shape'] = shape
-            else:
-                nodes.append({'id': node_id, 'label': label, 'shape': shape})
-            
-            processed_node_definitions.add(node_id)
-            node_ids.add(node_id)
+            # Add the node information
+            node = {'id': node_id, 'label': label, 'shape': shape}
+            nodes_append(node)
+            nodes_by_id[node_id] = node
 
     # Add default nodes for any node IDs mentioned in edges but not defined as nodes
     for node_id_in_edge in node_ids:
-        if not any(n['id'] == node_id_in_edge for n in nodes):
-            nodes.append({'id': node_id_in_edge, 'label': node_id_in_edge, 'shape': 'default'})
+        if node_id_in_edge not in nodes_by_id:
+            node = {'id': node_id_in_edge, 'label': node_id_in_edge, 'shape': 'default'}
+            nodes.append(node)
+            nodes_by_id[node_id_in_edge] = node
             
     # Return the extracted nodes and edges
     return nodes, edges
 
-def generate_drawio_xml(nodes: list[dict], edges: list[dict]) -> str:
+def _iter_drawio_xml(nodes: list[dict], edges: list[dict]) -> Iterator[str]:
     """
-    Generates Draw.io XML from parsed nodes and edges.
+    Yields the Draw.io XML for parsed nodes and edges as consecutive fragments.
 
     Args:
         nodes: A list of node dictionaries ({'id', 'label', 'shape'}).
         edges: A list of edge dictionaries ({'source', 'target', 'label'}).
 
-    Returns:
-        A string containing the Draw.io XML.
+    Yields:
+        Fragments of the Draw.io XML, in document order.
     """
-    # Create the root element of the Draw.io XML
-    mxfile = ET.Element("mxfile", compressed="false", host="app.diagrams.net")
-    
-    # Create the diagram element
-    diagram = ET.SubElement(mxfile, "diagram", id="Diagram1", name="Page-1")
-    
-    # Create the mxGraphModel element with default settings
-    mx_graph_model = ET.SubElement(diagram, "mxGraphModel", dx="1000", dy="800", grid="1", gridSize="10", guides="1", tooltips="1", connect="1", arrows="1", fold="1", page="1", pageScale="1", pageWidth="850", pageHeight="1100", math="0", shadow="0")
-    
-    # Create the root element for cells (nodes and edges)
-    root = ET.SubElement(mx_graph_model, "root")
-    
-    # Create the first two default mxCell elements
-    ET.SubElement(root, "mxCell", id="0")
-    ET.SubElement(root, "mxCell", id="1", parent="0")
+    yield _DRAWIO_XML_HEADER
 
     # Dictionary to store the mapping of node IDs to XML IDs
     xml_node_ids = {} 
@@ -162,91 +186,130 @@ def generate_drawio_xml(nodes: list[dict], edges: list[dict]) -> str:
     node_width = 120
     node_height = 60
 
+    # Attribute values shared by every node, converted to strings only once
+    node_width_str = str(node_width)
+    node_height_str = str(node_height)
+    node_y_str = str(node_y_position)
+
+    # Everything after the x attribute of a node's mxGeometry element is the
+    # same for every node, so it is formatted only once
+    node_geometry_tail = (
+        f' y="{node_y_str}" width="{node_width_str}" height="{node_height_str}" as="geometry" />'
+        '</mxCell>'
+    )
+    default_style = _SHAPE_STYLE['default']
+
+    # Horizontal position of the next node, advanced by node_spacing_x per node
+    next_x = node_x_position
+
     # Iterate through nodes to create node elements
-    for i, node in enumerate(nodes):
+    for node in nodes:
         xml_id = str(cell_id_counter)
         xml_node_ids[node['id']] = xml_id
         cell_id_counter += 1
 
-        style = ""
         # Determine the style based on the node shape
-        if node['shape'] == 'rectangle':
-            style = "rounded=0;whiteSpace=wrap;html=1;"
-        elif node['shape'] == 'rhombus':
-            style = "shape=rhombus;whiteSpace=wrap;html=1;"
-        elif node['shape'] == 'stadium': 
-            style = "shape=ellipse;perimeter=ellipsePerimeter;whiteSpace=wrap;html=1;"
-        elif node['shape'] == 'default': 
-            style = "rounded=0;whiteSpace=wrap;html=1;"
-        else: 
-            style = "rounded=0;whiteSpace=wrap;html=1;"
-
-        # Create the node cell element
-        node_cell = ET.SubElement(root, "mxCell", 
-                                  id=xml_id, 
-                                  value=node['label'], 
-                                  style=style, 
-                                  parent="1", 
-                                  vertex="1")
-        
-        # Calculate the position of the node
-        current_x = str(node_x_position + (i * node_spacing_x))
-        current_y = str(node_y_position)
-
-        # Create the mxGeometry element for the node
-        ET.SubElement(node_cell, "mxGeometry", attrib={ # 将属性明确放入 attrib 字典
-            "x": current_x,
-            "y": current_y,
-            "width": str(node_width),
-            "height": str(node_height),
-            "as": "geometry"
-        })
-
-    # Iterate through edges to create edge elements
-    for edge in edges:
-        edge_xml_id = str(cell_id_counter)
-        cell_id_counter += 1
+        style = _SHAPE_STYLE.get(node['shape'], default_style)
+
+        # Create the node cell element along with its mxGeometry element
+        yield (
+            f'<mxCell id="{xml_id}" value="{_escape_attrib(node["label"])}" style="{style}" parent="1" vertex="1">'
+            f'<mxGeometry x="{next_x}"{node_geometry_tail}'
+        )
+        next_x += node_spacing_x
+
+    # Check up front that the source and target of each edge exist, reporting
+    # the ones that do not; every edge still consumes a cell ID either way
+    valid_edges = []
+    for edge_xml_id, edge in enumerate(edges, start=cell_id_counter):
+        if edge['source'] in xml_node_ids and edge['target'] in xml_node_ids:
+            valid_edges.append((edge_xml_id, edge))
+        else:
+            print(f"Warning: Could not find XML ID for source/target of edge: {edge}", file=sys.stderr)
 
-        source_xml_id = xml_node_ids.get(edge['source'])
-        target_xml_id = xml_node_ids.get(edge['target'])
+    # Iterate through the valid edges to create edge elements
+    for edge_xml_id, edge in valid_edges:
+        source_xml_id = xml_node_ids[edge['source']]
+        target_xml_id = xml_node_ids[edge['target']]
 
-        # Check if the source and target XML IDs exist
-        if source_xml_id is None or target_xml_id is None:
-            print(f"Warning: Could not find XML ID for source/target of edge: {edge}", file=sys.stderr)
-            continue 
-
-        edge_style = "endArrow=classic;html=1;rounded=0;"
-        
-        # Create the edge cell element
-        edge_cell = ET.SubElement(root, "mxCell",
-                                  id=edge_xml_id,
-                                  value=edge['label'], 
-                                  style=edge_style,
-                                  parent="1",
-                                  edge="1",
-                                  source=source_xml_id,
-                                  target=target_xml_id)
-        
-        # Create the mxGeometry element for the edge
-        ET.SubElement(edge_cell, "mxGeometry", attrib={"relative": "1", "as": "geometry"}) # 将属性明确放入 attrib 字典
-
-    # Convert the ElementTree to an XML string
-    xml_string = ET.tostring(mxfile, encoding="unicode")
-    
-    # Return the generated XML string
-    return xml_string
+        # Create the edge cell element along with its mxGeometry element
+        yield (
+            f'<mxCell id="{edge_xml_id}" value="{_escape_attrib(edge["label"])}" style="{_EDGE_STYLE}" parent="1" edge="1" source="{source_xml_id}" target="{target_xml_id}">'
+            '<mxGeometry relative="1" as="geometry" />'
+            '</mxCell>'
+        )
+
+    yield _DRAWIO_XML_FOOTER
+
+def generate_drawio_xml(nodes: list[dict], edges: list[dict]) -> str:
+    """
+    Generates Draw.io XML from parsed nodes and edges.
+
+    Args:
+        nodes: A list of node dictionaries ({'id', 'label', 'shape'}).
+        edges: A list of edge dictionaries ({'source', 'target', 'label'}).
+
+    Returns:
+        A string containing the Draw.io XML.
+    """
+    return ''.join(_iter_drawio_xml(nodes, edges))
+
+def write_drawio_xml(nodes: list[dict], edges: list[dict], output_filepath: str) -> bool:
+    """
+    Writes Draw.io XML for parsed nodes and edges straight to a file, without
+    building the whole document as a string first.
+
+    Args:
+        nodes: A list of node dictionaries ({'id', 'label', 'shape'}).
+        edges: A list of edge dictionaries ({'source', 'target', 'label'}).
+        output_filepath: The path to the file where the XML should be saved.
+
+    Returns:
+        True if the file was written, False if saving it failed.
+    """
+    try:
+        with open(output_filepath, 'w', encoding='utf-8') as f:
+            f.writelines(_iter_drawio_xml(nodes, edges))
+    except IOError as e:
+        print(f"Error saving file to {output_filepath}: {e}", file=sys.stderr)
+        return False
+    return True
+
+@functools.lru_cache(maxsize=256)
+def _parse_mermaid_flowchart_cached(mermaid_code: str) -> tuple[tuple[Mapping, ...], tuple[Mapping, ...]]:
+    """
+    Parses Mermaid flowchart code, reusing the result of an earlier call with
+    the same code.
+
+    Up to 256 of the most recently used inputs are cached together with their
+    parse results, so memory use grows with the size of those inputs. Because
+    the results are shared between callers, they are returned as tuples of
+    read-only mappings.
+
+    Args:
+        mermaid_code: A string containing the Mermaid flowchart definition.
+
+    Returns:
+        The nodes and edges from parse_mermaid_flowchart(), as read-only copies.
+    """
+    nodes, edges = parse_mermaid_flowchart(mermaid_code)
+    return tuple(map(MappingProxyType, nodes)), tuple(map(MappingProxyType, edges))
 
 def convert_mermaid_to_drawio_xml(mermaid_code: str) -> str:
     """
     Orchestrates the conversion of Mermaid flowchart code to Draw.io XML.
 
+    Parse results are cached (see _parse_mermaid_flowchart_cached), so
+    converting the same Mermaid code again skips parsing. The XML is always
+    regenerated, so warnings about unknown edge endpoints are still printed.
+
     Args:
         mermaid_code: A string containing the Mermaid flowchart definition.
 
     Returns:
         A string containing the Draw.io XML.
     """
-    nodes, edges = parse_mermaid_flowchart(mermaid_code)
+    nodes, edges = _parse_mermaid_flowchart_cached(mermaid_code)
     xml_output = generate_drawio_xml(nodes, edges)
     return xml_output
 
@@ -266,6 +329,83 @@ def save_drawio_xml_to_file(xml_content: str, output_filepath: str) -> None:
         # Optionally, re-raise the exception or exit if this is critical
         # sys.exit(1) 
 
+def _convert_one(input_filepath: str, output_filepath: str) -> bool:
+    """
+    Converts one Mermaid file to a Draw.io file. Used as the worker function
+    when converting several files in parallel.
+
+    Args:
+        input_filepath: The path to the file containing the Mermaid code.
+        output_filepath: The path to the file where the XML should be saved.
+
+    Returns:
+        True if the file was converted, False if any step of the conversion failed.
+    """
+    try:
+        with open(input_filepath, 'r', encoding='utf-8') as f:
+            mermaid_content = f.read()
+    except (IOError, UnicodeDecodeError) as e:
+        print(f"Error reading input file {input_filepath}: {e}", file=sys.stderr)
+        return False
+
+    if not mermaid_content.strip():
+        print(f"Error: Mermaid input in {input_filepath} is empty.", file=sys.stderr)
+        return False
+
+    # Report any other failure for this file instead of letting it abort the batch
+    try:
+        output_dir = os.path.dirname(output_filepath)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        nodes, edges = parse_mermaid_flowchart(mermaid_content)
+        return write_drawio_xml(nodes, edges, output_filepath)
+    except Exception as e:
+        print(f"Error converting {input_filepath}: {e}", file=sys.stderr)
+        return False
+
+def convert_files_in_parallel(input_filepaths: list[str], output_dir: Optional[str] = None) -> int:
+    """
+    Converts several Mermaid files to Draw.io files using a pool of processes.
+
+    Each output file is named after its input file with a .drawio extension and
+    is saved next to the input file. When output_dir is given, the output files
+    are saved there instead, keeping their paths relative to the deepest
+    directory containing all input files.
+
+    Args:
+        input_filepaths: The paths to the files containing Mermaid code.
+        output_dir: Optional directory where the output files should be saved.
+
+    Returns:
+        The number of files that were converted.
+
+    Raises:
+        ValueError: If two input files would be saved to the same output file.
+    """
+    input_root = None
+    if output_dir is not None and input_filepaths:
+        input_root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in input_filepaths])
+
+    output_filepaths = []
+    for input_filepath in input_filepaths:
+        output_filepath = os.path.splitext(input_filepath)[0] + ".drawio"
+        if output_dir is not None:
+            relative_filepath = os.path.relpath(os.path.abspath(output_filepath), input_root)
+            output_filepath = os.path.join(output_dir, relative_filepath)
+        output_filepaths.append(output_filepath)
+
+    # Refuse to start if two workers would write to the same file
+    seen_outputs = {}
+    for input_filepath, output_filepath in zip(input_filepaths, output_filepaths):
+        key = os.path.normcase(os.path.abspath(output_filepath))
+        if key in seen_outputs:
+            raise ValueError(f"{seen_outputs[key]} and {input_filepath} would both be saved to {output_filepath}")
+        seen_outputs[key] = input_filepath
+
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(_convert_one, input_filepaths, output_filepaths)
+        return sum(results)
+
 def main():
     """
     Main function to handle CLI arguments and orchestrate the conversion process.
@@ -278,13 +418,41 @@ def main():
                              help="Path to an input file containing Mermaid code.")
     input_group.add_argument("-is", "--input_string", 
                              help="Mermaid code directly as a string.")
+    input_group.add_argument("-ig", "--input_glob", 
+                             help="Glob pattern matching several input files to convert in parallel.")
     
-    # Required output file argument
+    # Output file argument (required unless --input_glob is used)
     parser.add_argument("-o", "--output_file", 
-                        required=True, 
-                        help="Path for the output .drawio file.")
+                        help="Path for the output .drawio file. With --input_glob, an optional "
+                             "directory for the output files (defaults to next to each input file).")
     
     args = parser.parse_args()
+
+    # Convert every file matching the glob pattern and stop there
+    if args.input_glob:
+        input_filepaths = sorted(glob.glob(args.input_glob, recursive=True))
+        if not input_filepaths:
+            print(f"Error: No input files match {args.input_glob}", file=sys.stderr)
+            sys.exit(1)
+        if args.output_file:
+            try:
+                os.makedirs(args.output_file, exist_ok=True)
+            except OSError as e:
+                print(f"Error creating output directory {args.output_file}: {e}", file=sys.stderr)
+                sys.exit(1)
+
+        try:
+            converted_count = convert_files_in_parallel(input_filepaths, args.output_file)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Successfully converted {converted_count} of {len(input_filepaths)} Mermaid files to Draw.io XML")
+        if converted_count != len(input_filepaths):
+            sys.exit(1)
+        return
+
+    if not args.output_file:
+        parser.error("the following arguments are required: -o/--output_file")
     
     mermaid_content = ""
     
@@ -308,11 +476,10 @@ def main():
         print("Error: Mermaid input is empty.", file=sys.stderr)
         sys.exit(1)
 
-    # Call convert_mermaid_to_drawio_xml()
-    drawio_xml = convert_mermaid_to_drawio_xml(mermaid_content)
-    
-    # Call save_drawio_xml_to_file()
-    save_drawio_xml_to_file(drawio_xml, args.output_file)
+    # Parse the Mermaid input and stream the Draw.io XML to the output file
+    nodes, edges = parse_mermaid_flowchart(mermaid_content)
+    if not write_drawio_xml(nodes, edges, args.output_file):
+        sys.exit(1)
     
     print(f"Successfully converted Mermaid input to Draw.io XML and saved to {args.output_file}")
 